@@ -41,11 +41,15 @@ def main():
         print("  search             - Enhanced search with advanced filtering")
         print("  download           - Download datasets")
         print("  download-collection - Download all datasets from a collection")
+        print("  sync               - Incrementally sync a collection (SQLite state)")
+        print("  verify             - Verify downloaded datasets against server checksums")
+        print("  cache              - Inspect or prune the local checksum cache")
         print("  info               - Get detailed object information")
         print("  upload             - Upload files with auto-linking (auto-detects type)")
         print("  upload-lib         - Upload spectral libraries")
         print("  upload-fasta       - Upload FASTA database files")
         print("  upload-analyzed    - Upload analyzed data directories with filtering")
+        print("  upload-batch       - Upload files listed in a CSV/JSONL manifest concurrently")
         print()
         print("Usage: python pybis_scripts.py <tool> [args...]")
         print("Examples:")
@@ -67,6 +71,12 @@ def main():
         pybis_download_main(args)
     elif tool == "download-collection":
         pybis_download_collection_main(args)
+    elif tool == "sync":
+        pybis_sync_main(args)
+    elif tool == "verify":
+        pybis_verify_main(args)
+    elif tool == "cache":
+        pybis_cache_main(args)
     elif tool == "info":
         pybis_info_main(args)
     elif tool == "upload":
@@ -77,9 +87,11 @@ def main():
         pybis_upload_fasta_main(args)
     elif tool == "upload-analyzed":
         pybis_upload_analyzed_main(args)
+    elif tool == "upload-batch":
+        pybis_upload_batch_main(args)
     else:
         print(f"❌ Unknown tool: {tool}")
-        print("Available tools: connect, config, search, download, download-collection, info, upload, upload-lib, upload-fasta, upload-analyzed")
+        print("Available tools: connect, config, search, download, download-collection, sync, verify, cache, info, upload, upload-lib, upload-fasta, upload-analyzed, upload-batch")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+"""Local HTTP datastore and openBIS stand-ins shared by the download tests"""
+import hashlib
+import threading
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from urllib.parse import urlparse, unquote
+
+import pandas as pd
+import pytest
+
+import pybis_common as pc
+
+
+DATASETS = {
+    # Same paths in both datasets; x.log has equal sizes but different content
+    '20250101000000000-1': {'original/report.tsv': b'A report\n', 'original/x.log': b'log A\n'},
+    '20250101000000000-2': {'original/report.tsv': b'B report, longer\n', 'original/x.log': b'log B\n'},
+}
+
+
+class _DatastoreHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        perm_id, file_path = unquote(urlparse(self.path).path).split('/datastore_server/', 1)[1].split('/', 1)
+        body = DATASETS.get(perm_id, {}).get(file_path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start, end = 0, len(body)
+        requested = self.headers.get('Range')
+        self.server.requests.append((file_path, requested))
+        if requested:
+            first, _, last = requested.split('=', 1)[1].partition('-')
+            start, end = int(first), int(last) + 1 if last else len(body)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+
+        # server.cut_once maps (path, start) to the bytes sent before the connection drops, once
+        cut = self.server.cut_once.pop((file_path, start), None)
+        if cut is not None:
+            self.wfile.write(body[start:start + cut])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:end])
+
+
+class _FakeDataset:
+    def __init__(self, openbis, perm_id):
+        self.openbis = openbis
+        self.permId = self.code = perm_id
+
+    def _get_download_url(self):
+        return self.openbis.url
+
+    def get_dataset_files(self):
+        # Columns as pybis returns them; a CRC32 the server did not record reads as '0'
+        checksum_type = self.openbis.checksum_type
+        return SimpleNamespace(df=pd.DataFrame([
+            {'path': path, 'directory': False, 'fileLength': len(data),
+             'checksumCRC32': '%x' % zlib.crc32(data) if self.openbis.crc32_recorded else '0',
+             'checksum': hashlib.new(checksum_type.replace('-', ''), data).hexdigest() if checksum_type else None,
+             'checksumType': checksum_type}
+            for path, data in DATASETS[self.permId].items()]))
+
+    def get_files(self, start_folder='/'):
+        return self.get_dataset_files().df[['directory', 'path', 'fileLength', 'checksumCRC32']].rename(
+            columns={'directory': 'isDirectory', 'path': 'pathInDataSet', 'fileLength': 'fileSize',
+                     'checksumCRC32': 'crc32Checksum'})
+
+
+class _FakeOpenbis:
+    token = 'test-token'
+    verify_certificates = False
+    crc32_recorded = True
+    checksum_type = None
+
+    def __init__(self, url):
+        self.url = url
+
+    def get_dataset(self, code):
+        return _FakeDataset(self, code) if code in DATASETS else None
+
+    def get_collection(self, collection):
+        return SimpleNamespace(identifier=collection)
+
+    def get_datasets(self, **search):
+        return pd.DataFrame([{'code': code, 'registrationDate': '2025-01-01 00:00:00'} for code in DATASETS])
+
+
+@pytest.fixture
+def openbis(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(pc, 'THROUGHPUT_HISTORY_PATH', tmp_path / 'home' / '.pybis' / 'throughput.json')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _DatastoreHandler)
+    server.requests, server.cut_once = [], {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    openbis = _FakeOpenbis(f'http://127.0.0.1:{server.server_address[1]}')
+    openbis.server = server
+    yield openbis
+    server.shutdown()
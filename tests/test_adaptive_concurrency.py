@@ -0,0 +1,23 @@
+"""Adaptive concurrency controllers"""
+import pybis_common as pc
+from conftest import DATASETS
+
+
+def test_each_controller_measures_only_its_own_transfers(openbis, tmp_path, monkeypatch):
+    controllers = []
+
+    class RecordingController(pc._AdaptiveConcurrency):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            controllers.append(self)
+
+    monkeypatch.setattr(pc, '_AdaptiveConcurrency', RecordingController)
+    results = pc._download_datasets_parallel(openbis, list(DATASETS), str(tmp_path / 'out'), pc.AUTO_JOBS,
+                                             file_jobs=pc.AUTO_JOBS)
+    assert all(success for _, success in results)
+
+    dataset_bytes = sorted(sum(len(data) for data in files.values()) for files in DATASETS.values())
+    file_controllers = [c for c in controllers if c.label == 'file transfers']
+    dataset_controllers = [c for c in controllers if c.label == 'dataset downloads']
+    assert sorted(c.meter.total for c in file_controllers) == dataset_bytes
+    assert [c.meter.total for c in dataset_controllers] == [sum(dataset_bytes)]
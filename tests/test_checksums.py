@@ -0,0 +1,45 @@
+"""Server checksums as pybis reports them"""
+import pandas as pd
+
+import pybis_common as pc
+from conftest import DATASETS
+
+
+def test_missing_crc32_reported_as_zero_is_unknown():
+    assert pc._get_remote_crc32(pd.Series({'fileSize': 12, 'crc32Checksum': '0'})) is None
+    assert pc._get_remote_crc32(pd.Series({'fileSize': 0, 'crc32Checksum': '0'})) == 0
+    assert pc._get_remote_crc32(pd.Series({'fileSize': 12, 'crc32Checksum': 'ff'})) == 0xff
+
+
+def test_download_without_recorded_crc32(openbis, tmp_path):
+    openbis.crc32_recorded = False
+    output = tmp_path / 'out'
+    for code in DATASETS:
+        assert pc._download_dataset(openbis, code, str(output))
+        assert pc._download_dataset(openbis, code, str(output), force=True, verify_checksum=True)
+
+    for code, files in DATASETS.items():
+        for path, data in files.items():
+            assert (output / code / path).read_bytes() == data
+
+
+def test_typed_checksum_detects_corruption_without_crc32(openbis, tmp_path):
+    openbis.crc32_recorded = False
+    openbis.checksum_type = 'SHA-256'
+    code, path = '20250101000000000-1', 'original/report.tsv'
+    output = tmp_path / 'out'
+    assert pc._download_dataset(openbis, code, str(output))
+
+    local_file = output / code / path
+    with open(local_file, 'r+b') as f:
+        f.write(b'X')
+    assert pc._download_dataset(openbis, code, str(output), verify_checksum=True)
+    assert local_file.read_bytes() == DATASETS[code][path]
+
+
+def test_cache_is_keyed_by_the_typed_checksum(openbis, tmp_path):
+    openbis.checksum_type = 'SHA-256'
+    cache = tmp_path / 'cas'
+    assert pc._download_dataset(openbis, '20250101000000000-1', str(tmp_path / 'out'), cache_dir=str(cache))
+    keys = sorted(f.name for f in (cache / 'objects').rglob('*') if f.is_file())
+    assert len(keys) == 2 and all(key.startswith('sha256-') for key in keys)
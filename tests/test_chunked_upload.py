@@ -0,0 +1,94 @@
+"""Resumable uploads to the session workspace"""
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import pybis_common as pc
+
+CHUNK_SIZE = 1000
+
+
+class _WorkspaceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failing_parts = set()
+    received = []
+    files = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        query = parse_qs(urlparse(self.path).query)
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        part, start = int(query['id'][0]), int(query['startByte'][0])
+        if part in self.failing_parts:
+            self.send_response(500)
+        else:
+            self.received.append(part)
+            content = self.files.setdefault(query['filename'][0], bytearray())
+            content.extend(bytes(max(0, start + len(body) - len(content))))
+            content[start:start + len(body)] = body
+            self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    monkeypatch.setattr(pc, 'UPLOAD_CHUNK_RETRIES', 1)
+    _WorkspaceHandler.failing_parts, _WorkspaceHandler.received, _WorkspaceHandler.files = set(), [], {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _WorkspaceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    openbis = SimpleNamespace(token='session-1', verify_certificates=False,
+                              get_datastores=lambda: {'downloadUrl': [url]})
+    yield openbis, SimpleNamespace(openbis=openbis)
+    server.shutdown()
+
+
+def test_interrupted_upload_resumes_with_the_missing_parts(workspace, tmp_path):
+    openbis, dataset = workspace
+    data = bytes(range(256)) * 40
+    file_path = tmp_path / 'library.tsv'
+    file_path.write_bytes(data)
+    journal_path = tmp_path / 'journal'
+
+    _WorkspaceHandler.failing_parts = {4, 7}
+    with pytest.raises(RuntimeError, match='run the same upload again to resume'):
+        pc._upload_to_session_workspace(openbis, dataset, [file_path], pc._UploadJournal(journal_path),
+                                        chunk_size=CHUNK_SIZE, jobs=3)
+    assert sorted(_WorkspaceHandler.received) == [1, 2, 3, 5, 6, 8, 9, 10, 11]
+
+    # A new process picks up the journal and only sends what was not confirmed
+    _WorkspaceHandler.failing_parts, _WorkspaceHandler.received = set(), []
+    journal = pc._UploadJournal(journal_path)
+    key, upload_id = pc._upload_to_session_workspace(openbis, dataset, [file_path], journal,
+                                                     chunk_size=CHUNK_SIZE, jobs=3)
+    assert sorted(_WorkspaceHandler.received) == [4, 7]
+    assert bytes(_WorkspaceHandler.files[f'{upload_id}/library.tsv']) == data
+
+    journal.finish(key)
+    assert not list(journal_path.iterdir())
+
+
+def test_concurrent_processes_keep_each_others_progress(tmp_path):
+    journal_path = tmp_path / 'journal'
+    files = []
+    for name in ('a.raw', 'b.raw'):
+        files.append(tmp_path / name)
+        files[-1].write_bytes(b'x' * 3000)
+
+    # Two processes, each with its own journal object over the same directory
+    first, second = pc._UploadJournal(journal_path), pc._UploadJournal(journal_path)
+    key_a, _ = first.start([files[0]], 'session-1', CHUNK_SIZE)
+    key_b, _ = second.start([files[1]], 'session-1', CHUNK_SIZE)
+    first.confirm(key_a, str(files[0]), 1)
+    second.confirm(key_b, str(files[1]), 1)
+    first.confirm(key_a, str(files[0]), 2)
+
+    reader = pc._UploadJournal(journal_path)
+    assert reader.start([files[0]], 'session-1', CHUNK_SIZE)[1]['files'][str(files[0])]['done'] == [1, 2]
+    assert reader.start([files[1]], 'session-1', CHUNK_SIZE)[1]['files'][str(files[1])]['done'] == [1]
@@ -0,0 +1,33 @@
+"""Datasets answered by their completion marker"""
+import pybis_common as pc
+from conftest import DATASETS
+
+CODE = '20250101000000000-1'
+
+
+def test_complete_dataset_is_answered_without_connecting(openbis, tmp_path, monkeypatch):
+    output = tmp_path / 'out'
+    assert pc._download_dataset(openbis, CODE, str(output))
+
+    def no_connection():
+        raise AssertionError("contacted the server")
+
+    monkeypatch.setattr(pc, 'get_openbis_connection', no_connection)
+    pc.pybis_download_main([CODE, '--output', str(output)])
+
+
+def test_complete_collection_is_not_scanned(openbis, tmp_path, monkeypatch):
+    output = tmp_path / 'out'
+    for code in DATASETS:
+        assert pc._download_dataset(openbis, code, str(output))
+
+    scans = []
+    build_local_index = pc._build_local_index
+    monkeypatch.setattr(pc, '_build_local_index', lambda *args: scans.append(args) or build_local_index(*args))
+    assert pc._download_collection_datasets(openbis, '/DDB/CK/FASTA', str(output), jobs=2)
+    assert scans == []
+
+    # Only a dataset without a marker pays for the (single, shared) scan
+    (output / pc.COMPLETION_MARKER_DIR / f'{CODE}.json').unlink()
+    assert pc._download_collection_datasets(openbis, '/DDB/CK/FASTA', str(output))
+    assert len(scans) == 1
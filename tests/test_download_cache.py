@@ -0,0 +1,55 @@
+"""Content-addressed download cache"""
+import os
+
+import pybis_common as pc
+from conftest import DATASETS
+
+CODE = '20250101000000000-1'
+PATH = 'original/report.tsv'
+
+
+def _edit_in_place(file_path):
+    os.chmod(file_path, 0o644)
+    with open(file_path, 'r+b') as f:
+        f.write(b'X')
+
+
+def test_edited_output_does_not_reach_the_cache(openbis, tmp_path):
+    output, cache = tmp_path / 'out', tmp_path / 'cas'
+    assert pc._download_dataset(openbis, CODE, str(output), cache_dir=str(cache))
+    local_file = output / CODE / PATH
+    objects = [f for f in (cache / 'objects').rglob('*') if f.is_file()]
+    assert len(objects) == len(DATASETS[CODE])
+    assert all(not os.path.samefile(local_file, f) for f in objects)
+
+    _edit_in_place(local_file)
+    assert pc._download_dataset(openbis, CODE, str(output), cache_dir=str(cache), force=True)
+    assert local_file.read_bytes() == DATASETS[CODE][PATH]
+
+    _edit_in_place(local_file)
+    assert pc._download_dataset(openbis, CODE, str(output), cache_dir=str(cache), verify_checksum=True)
+    assert local_file.read_bytes() == DATASETS[CODE][PATH]
+
+    fresh = tmp_path / 'fresh'
+    assert pc._download_dataset(openbis, CODE, str(fresh), cache_dir=str(cache))
+    for path, data in DATASETS[CODE].items():
+        assert (fresh / CODE / path).read_bytes() == data
+
+
+def test_corrupt_cache_object_is_evicted(openbis, tmp_path):
+    cache = tmp_path / 'cas'
+    assert pc._download_dataset(openbis, CODE, str(tmp_path / 'a'), cache_dir=str(cache))
+    for object_path in (cache / 'objects').rglob('*'):
+        if object_path.is_file():
+            _edit_in_place(object_path)
+
+    assert pc._download_dataset(openbis, CODE, str(tmp_path / 'b'), cache_dir=str(cache))
+    for path, data in DATASETS[CODE].items():
+        assert (tmp_path / 'b' / CODE / path).read_bytes() == data
+
+
+def test_files_without_checksum_are_not_cached(openbis, tmp_path):
+    openbis.crc32_recorded = False
+    cache = tmp_path / 'cas'
+    assert pc._download_dataset(openbis, CODE, str(tmp_path / 'out'), cache_dir=str(cache))
+    assert not [f for f in (cache / 'objects').rglob('*') if f.is_file()]
@@ -0,0 +1,25 @@
+"""Regression checks for the on-disk layout of downloaded datasets"""
+import pybis_common as pc
+from conftest import DATASETS
+
+
+def test_datasets_with_equal_paths_do_not_collide(openbis, tmp_path):
+    output = tmp_path / 'out'
+    for code in DATASETS:
+        assert pc._download_dataset(openbis, code, str(output))
+
+    for code, files in DATASETS.items():
+        for path, data in files.items():
+            assert (output / code / path).read_bytes() == data
+    assert not (output / 'original').exists()
+
+    report = pc._audit_download_root(str(output))
+    assert report['verified'] == 4
+    assert not report['missing'] and not report['corrupted'] and not report['extra']
+
+    # A second run is answered by the completion marker and leaves each dataset intact
+    for code in DATASETS:
+        assert pc._download_dataset(openbis, code, str(output))
+    for code, files in DATASETS.items():
+        for path, data in files.items():
+            assert (output / code / path).read_bytes() == data
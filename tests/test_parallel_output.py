@@ -0,0 +1,35 @@
+"""Per-dataset logs of parallel downloads"""
+import contextlib
+import io
+import re
+
+import pytest
+
+import pybis_common as pc
+from conftest import DATASETS
+
+
+@pytest.mark.parametrize('file_jobs', [4, pc.AUTO_JOBS])
+def test_file_worker_output_stays_in_its_dataset_log(openbis, tmp_path, monkeypatch, file_jobs):
+    download_file = pc._download_dataset_file
+    
+    def marked(session, dataset, file_path, *args, **kwargs):
+        print(f"MARK {dataset.permId} {file_path}")
+        return download_file(session, dataset, file_path, *args, **kwargs)
+    
+    monkeypatch.setattr(pc, '_download_dataset_file', marked)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        results = pc._download_datasets_parallel(openbis, list(DATASETS), str(tmp_path / 'out'), 2,
+                                                 file_jobs=file_jobs)
+    
+    assert all(success for _, success in results)
+    current, marks = None, 0
+    for line in output.getvalue().splitlines():
+        header = re.search(r'\] [✅❌] (\S+)', line)
+        if header:
+            current = header.group(1)
+        elif line.startswith('MARK'):
+            marks += 1
+            assert line.split()[1] == current
+    assert marks == sum(len(files) for files in DATASETS.values())
@@ -0,0 +1,26 @@
+"""Interrupted downloads continue with range requests"""
+import os
+
+import pybis_common as pc
+from conftest import DATASETS
+
+CODE = '20250101000000000-3'
+PATH = 'original/big.bin'
+DATA = os.urandom(400_000)
+
+
+def test_interrupted_download_resumes_from_the_part_file(openbis, tmp_path, monkeypatch):
+    monkeypatch.setitem(DATASETS, CODE, {PATH: DATA})
+    output = tmp_path / 'out'
+    openbis.server.cut_once[(PATH, 0)] = 150_000
+
+    assert not pc._download_dataset(openbis, CODE, str(output))
+    local_file = output / CODE / PATH
+    assert not local_file.exists()
+    assert pc._partial_file_path(local_file).stat().st_size == 150_000
+
+    openbis.server.requests.clear()
+    assert pc._download_dataset(openbis, CODE, str(output))
+    assert openbis.server.requests == [(PATH, 'bytes=150000-')]
+    assert local_file.read_bytes() == DATA
+    assert not pc._partial_file_path(local_file).exists()
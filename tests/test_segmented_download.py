@@ -0,0 +1,44 @@
+"""Large files fetched as parallel byte ranges"""
+import os
+import zlib
+
+import pytest
+
+import pybis_common as pc
+from conftest import DATASETS
+
+CODE = '20250101000000000-3'
+PATH = 'original/big.bin'
+DATA = os.urandom(400_000)
+
+
+@pytest.fixture
+def large_file(openbis, monkeypatch):
+    monkeypatch.setitem(DATASETS, CODE, {PATH: DATA})
+    monkeypatch.setattr(pc, 'SEGMENT_THRESHOLD_BYTES', 100_000)
+    return openbis
+
+
+def test_crc32_combine_matches_the_crc32_of_the_concatenation():
+    head, tail = DATA[:123_457], DATA[123_457:]
+    assert pc._crc32_combine(zlib.crc32(head), zlib.crc32(tail), len(tail)) == zlib.crc32(DATA)
+
+
+def test_segments_are_fetched_as_ranges_and_verified(large_file, tmp_path):
+    output = tmp_path / 'out'
+    assert pc._download_dataset(large_file, CODE, str(output), segments=4)
+    assert sorted(large_file.server.requests) == [
+        (PATH, 'bytes=0-99999'), (PATH, 'bytes=100000-199999'),
+        (PATH, 'bytes=200000-299999'), (PATH, 'bytes=300000-399999')]
+    assert (output / CODE / PATH).read_bytes() == DATA
+
+
+def test_interrupted_segment_resumes_alone(large_file, tmp_path):
+    output = tmp_path / 'out'
+    large_file.server.cut_once[(PATH, 200_000)] = 30_000
+    assert not pc._download_dataset(large_file, CODE, str(output), segments=4)
+
+    large_file.server.requests.clear()
+    assert pc._download_dataset(large_file, CODE, str(output), segments=4)
+    assert large_file.server.requests == [(PATH, 'bytes=230000-299999')]
+    assert (output / CODE / PATH).read_bytes() == DATA
@@ -0,0 +1,42 @@
+"""Duplicate detection for uploads"""
+import sqlite3
+import zlib
+
+import pybis_common as pc
+
+CONTENT = b'>sp|P12345\nMKTAYIAK\n'
+FINGERPRINT = (len(CONTENT), zlib.crc32(CONTENT))
+
+
+def test_only_single_file_datasets_of_the_same_type_and_collection_match(tmp_path):
+    index = pc._UploadIndex(tmp_path / 'index.sqlite')
+    entry = ('original/db.fasta',) + FINGERPRINT
+    index.add_dataset('SAME', [entry], collection='/DDB/CK/FASTA', dataset_type='BIO_DB')
+    index.add_dataset('ANALYSIS', [entry, ('original/report.tsv', 10, 1)],
+                      collection='/DDB/CK/FASTA', dataset_type='BIO_DB')
+    index.add_dataset('OTHER_TYPE', [entry], collection='/DDB/CK/FASTA', dataset_type='ANALYZED_DATA')
+    index.add_dataset('OTHER_COLLECTION', [entry], collection='/DDB/CK/UNKNOWN', dataset_type='BIO_DB')
+    index.add_dataset('UNCHECKED_FILES', [entry], collection='/DDB/CK/FASTA', dataset_type='BIO_DB',
+                      file_count=3)
+
+    assert index.find(*FINGERPRINT, '/ddb/ck/fasta/', 'bio_db') == ['SAME']
+    assert sorted(index.find(*FINGERPRINT, '/DDB/CK/FASTA')) == ['OTHER_TYPE', 'SAME']
+    assert index.find(*FINGERPRINT, '/DDB/CK/PREDSPECLIB', 'BIO_DB') == []
+
+
+def test_index_without_collections_is_rebuilt(tmp_path):
+    path = tmp_path / 'index.sqlite'
+    db = sqlite3.connect(str(path))
+    db.executescript("""
+        CREATE TABLE files (dataset_code TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL,
+                            crc32 INTEGER NOT NULL, PRIMARY KEY (dataset_code, path));
+        CREATE TABLE datasets (dataset_code TEXT PRIMARY KEY, indexed_at REAL NOT NULL);
+        INSERT INTO files VALUES ('OLD', 'original/db.fasta', 21, 1);
+        INSERT INTO datasets VALUES ('OLD', 0);
+    """)
+    db.close()
+
+    index = pc._UploadIndex(path)
+    assert index.indexed(['OLD']) == set()
+    index.add_dataset('NEW', [('original/db.fasta',) + FINGERPRINT], collection='/A/B/C', dataset_type='T')
+    assert index.find(*FINGERPRINT, '/A/B/C', 'T') == ['NEW']